@@ -4,17 +4,24 @@ Traffic Monitor - Automated commute time tracking
 Scrapes Google Maps to track travel times between home and office
 """
 
+import asyncio
+import atexit
 import os
 import sys
 import logging
+from dataclasses import dataclass
 from datetime import datetime
 from typing import Dict, Optional, Tuple
-import time
+from urllib.parse import quote
 import re
+import shelve
+import time
+import httpx
 from dotenv import load_dotenv
-from playwright.sync_api import sync_playwright, Page, Browser
+from playwright.async_api import async_playwright, Page, Browser, TimeoutError as PlaywrightTimeoutError
 from supabase import create_client, Client
-import pytz
+from supabase.client import ClientOptions
+from zoneinfo import ZoneInfo
 
 # Load environment variables
 load_dotenv()
@@ -22,16 +29,135 @@ load_dotenv()
 # Configuration
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-TIMEZONE = pytz.timezone(os.getenv("TIMEZONE", "Asia/Kolkata"))
+GOOGLE_MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY")
+TIMEZONE = ZoneInfo(os.getenv("TIMEZONE", "Asia/Kolkata"))
+
+# Use the browser-based scraper when the Distance Matrix API is
+# unavailable (no key) or fails. Set to "false" to disable entirely.
+PLAYWRIGHT_FALLBACK = os.getenv("PLAYWRIGHT_FALLBACK", "true").lower() == "true"
+
+# Google Distance Matrix API endpoint
+DISTANCE_MATRIX_URL = "https://maps.googleapis.com/maps/api/distancematrix/json"
+
+# Scrape cache: runs within the same TTL bucket reuse the previous
+# result instead of hitting Google Maps again. Persisted via shelve so
+# the cache survives separate cron invocations.
+CACHE_TTL_SECONDS = 300
+CACHE_FILE = "scrape_cache"
+
+# Supabase write batching: records are buffered locally and committed
+# in a single insert once the batch fills, the interval elapses, or the
+# process exits
+BATCH_SIZE = 10
+FLUSH_INTERVAL_SECONDS = 60
 
 # Addresses
 HOME_ADDRESS = "34, 1st ave, teachers colony, HSR layout 5th sector, 560034"
 OFFICE_ADDRESS = "RMZ Eco World Campus 32, Bhoganahalli Village, Bengaluru East, Bengaluru, Karnataka 560103"
 
+
+@dataclass(frozen=True, slots=True)
+class Endpoint:
+    """A fixed route endpoint with its URL encoding precomputed"""
+    name: str
+    raw: str
+    encoded: str
+    lat: float
+    lng: float
+
+
+HOME = Endpoint(
+    name="home",
+    raw=HOME_ADDRESS,
+    encoded=quote(HOME_ADDRESS),
+    lat=12.9121,
+    lng=77.6446,
+)
+OFFICE = Endpoint(
+    name="office",
+    raw=OFFICE_ADDRESS,
+    encoded=quote(OFFICE_ADDRESS),
+    lat=12.9258,
+    lng=77.6838,
+)
+
+# Directions URLs, one per (origin, destination) pair, built once at
+# import. dirflg=b selects two-wheeler mode.
+_URL_FMT = "https://www.google.com/maps/dir/{o}/{d}/?dirflg=b"
+MAPS_URLS = {
+    (HOME.name, OFFICE.name): _URL_FMT.format(o=HOME.encoded, d=OFFICE.encoded),
+    (OFFICE.name, HOME.name): _URL_FMT.format(o=OFFICE.encoded, d=HOME.encoded),
+}
+
+# Browser identity shared by the fast-path probe and the real browser
+USER_AGENT = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
+
+# Route data embedded in the directions page HTML served to Google's
+# own frontend; a hit here means no browser is needed at all
+_FAST_MIN_RE = re.compile(r'"(\d+)\s*min"')
+_FAST_KM_RE = re.compile(r'"([\d.]+)\s*km"')
+
 # Time windows (24-hour format)
 MORNING_WINDOW = (10, 12)  # 10 AM to 12 PM
 EVENING_WINDOW = (16, 18)  # 4 PM to 6 PM
 
+# Day names indexed by datetime.weekday(); a tuple lookup is much
+# cheaper than strftime('%A') and immune to locale settings
+_DOW = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+
+# Selectors for travel data on the Google Maps directions page
+DURATION_SELECTORS = (
+    'div.Fk3sm.fontHeadlineSmall',  # Common selector for travel time
+    'div[jstcache="3"]',
+    'h1.TnqQD-ZMv3u-headline-4-text',
+    'div.XdKEzd',
+    'span.delay',
+)
+DISTANCE_SELECTORS = (
+    'div.Fk3sm.fontBodyMedium',
+    'div.ivN21e.tUEI8e.fontBodyMedium',
+)
+
+# Runs all selector queries in-browser and returns the matches in one
+# CDP round-trip, instead of query_selector_all + inner_text per element.
+# Each selector group is a comma-separated union, so one querySelectorAll
+# covers every candidate.
+_EXTRACT_JS = """
+([durationSelector, distanceSelector]) => {
+    const firstMatch = (selector, pattern) => {
+        for (const el of document.querySelectorAll(selector)) {
+            const text = el.innerText.trim();
+            if (pattern.test(text)) {
+                return text;
+            }
+        }
+        return null;
+    };
+    const traffic = document.body.innerText.match(
+        /heavy traffic|moderate traffic|light traffic/i
+    );
+    return {
+        duration: firstMatch(durationSelector, /min|hour/i),
+        distance: firstMatch(distanceSelector, /km|mi/i),
+        traffic: traffic ? traffic[0] : null,
+    };
+}
+"""
+
+# Resources the scraper never reads; aborting them keeps the page load
+# down to the documents/XHR that carry the route data
+BLOCKED_RESOURCE_TYPES = {"image", "font", "media", "stylesheet"}
+BLOCKED_HOST_RE = re.compile(
+    r'(?:googletagmanager\.com|google-analytics\.com|doubleclick\.net'
+    r'|khms\d*\.googleapis\.com)'
+)
+
+# Precompiled duration patterns (avoids recompile/cache lookups per call).
+# _DURATION_RE captures hours and minutes in one pass; the digit
+# lookahead anchors the match at the first number so neither group is
+# forced to be present.
+_DURATION_RE = re.compile(r'(?=\d)(?:(\d+)\s*h(?:our|r)?s?\s*)?(?:(\d+)\s*min)?', re.IGNORECASE)
+
 # Setup logging
 logging.basicConfig(
     level=logging.INFO,
@@ -44,6 +170,14 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+async def _block_unneeded_requests(route, request):
+    """Abort requests for resources the scraper never uses"""
+    if request.resource_type in BLOCKED_RESOURCE_TYPES or BLOCKED_HOST_RE.search(request.url):
+        await route.abort()
+    else:
+        await route.continue_()
+
+
 class TrafficMonitor:
     """Main class for monitoring traffic via Google Maps"""
     
@@ -52,17 +186,56 @@ class TrafficMonitor:
         if not SUPABASE_URL or not SUPABASE_KEY:
             raise ValueError("SUPABASE_URL and SUPABASE_KEY must be set in .env file")
         
-        self.supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-        self.browser: Optional[Browser] = None
-        
-    def determine_direction_from_time(self) -> str:
+        # One client for the process lifetime: inserts reuse its
+        # keep-alive connection instead of paying a TLS handshake each,
+        # and a short timeout keeps a hung Supabase from stalling the cron
+        self.supabase: Client = create_client(
+            SUPABASE_URL,
+            SUPABASE_KEY,
+            options=ClientOptions(postgrest_client_timeout=5, schema="public")
+        )
+
+        # Long-lived Playwright resources, created lazily on first scrape
+        # so concurrent scrapes share one browser launch. Each scrape
+        # gets its own context; the browser is closed by the run wrappers.
+        self._pw = None
+        self._browser: Optional[Browser] = None
+        self._cache_hits = 0
+        self._cache_misses = 0
+        self._pending: list = []
+        self._last_flush = time.time()
+        # Loop-bound primitives, re-created per session by _init_session
+        self._scrape_semaphore: Optional[asyncio.Semaphore] = None
+        self._cache_lock: Optional[asyncio.Lock] = None
+        atexit.register(self._flush)
+
+    async def _get_browser(self) -> Browser:
+        """Return the shared browser, launching it once"""
+        if self._browser is None:
+            logger.info("Launching browser...")
+            self._pw = await async_playwright().start()
+            self._browser = await self._pw.chromium.launch(
+                headless=True,
+                args=["--disable-dev-shm-usage", "--no-sandbox"]
+            )
+        return self._browser
+
+    async def aclose(self):
+        """Shut down the shared browser and Playwright driver"""
+        if self._browser:
+            await self._browser.close()
+            self._browser = None
+        if self._pw:
+            await self._pw.stop()
+            self._pw = None
+
+    def determine_direction_from_time(self, now: datetime) -> str:
         """
-        Determine route direction based on current time
+        Determine route direction based on the given time
         Returns: route_direction ('home_to_office' or 'office_to_home')
         """
-        now = datetime.now(TIMEZONE)
         current_hour = now.hour
-        
+
         # Morning window: home to office
         if MORNING_WINDOW[0] <= current_hour < MORNING_WINDOW[1]:
             return "home_to_office"
@@ -78,132 +251,247 @@ class TrafficMonitor:
         """
         Extract numeric duration in minutes from text like '25 min' or '1 hour 15 min'
         """
-        try:
-            total_minutes = 0
-            
-            # Check for hours
-            hour_match = re.search(r'(\d+)\s*h', duration_text, re.IGNORECASE)
-            if hour_match:
-                total_minutes += int(hour_match.group(1)) * 60
-            
-            # Check for minutes
-            min_match = re.search(r'(\d+)\s*min', duration_text, re.IGNORECASE)
-            if min_match:
-                total_minutes += int(min_match.group(1))
-            
-            return total_minutes if total_minutes > 0 else None
-        except Exception as e:
-            logger.error(f"Error extracting duration: {e}")
+        match = _DURATION_RE.search(duration_text)
+        if not match:
             return None
+
+        hours, minutes = match.groups()
+        total_minutes = (int(hours) if hours else 0) * 60 + (int(minutes) if minutes else 0)
+        return total_minutes or None
     
-    def scrape_google_maps(self, origin: str, destination: str) -> Optional[Dict]:
+    async def scrape_google_maps(self, origin: Endpoint, destination: Endpoint) -> Optional[Dict]:
         """
-        Scrape Google Maps for traffic information
+        Get traffic information for a route
+        Tries the Distance Matrix API first (a single ~200ms JSON call),
+        falling back to browser scraping only if enabled and needed.
         Returns: Dictionary with duration, distance, and traffic status
         """
+        if GOOGLE_MAPS_API_KEY:
+            data = await self._fetch_distance_matrix(origin, destination)
+            if data:
+                return data
+        else:
+            logger.warning("GOOGLE_MAPS_API_KEY not set, skipping Distance Matrix API")
+
+        data = await self._fast_scrape(origin, destination)
+        if data:
+            return data
+
+        if PLAYWRIGHT_FALLBACK:
+            logger.info("Falling back to browser-based scraping...")
+            return await self._scrape_with_playwright(origin, destination)
+
+        return None
+
+    async def _cached_scrape(self, route_direction: str, origin: Endpoint, destination: Endpoint) -> Optional[Dict]:
+        """
+        Scrape with a TTL cache keyed by (direction, time bucket)
+        A second invocation within the same bucket returns the stored
+        payload without touching Google Maps at all.
+        """
+        bucket = int(time.time() // CACHE_TTL_SECONDS)
+        key = f"{route_direction}:{bucket}"
+
+        # A broken cache must never cost a scrape, so only the shelve
+        # operations sit inside try blocks: a failed read is a miss and
+        # a failed write is ignored
         try:
-            with sync_playwright() as p:
-                # Launch browser
-                logger.info("Launching browser...")
-                browser = p.chromium.launch(headless=True)
-                context = browser.new_context(
-                    viewport={'width': 1920, 'height': 1080},
-                    user_agent='Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
+            async with self._cache_lock:
+                with shelve.open(CACHE_FILE) as cache:
+                    if key in cache:
+                        self._cache_hits += 1
+                        logger.info("Scrape cache hit for %s (hits=%d, misses=%d)",
+                                    key, self._cache_hits, self._cache_misses)
+                        return cache[key]
+        except Exception as e:
+            # Covers dbm.error from a corrupt/unrecognized cache file and
+            # unpickling errors from a corrupt value, not just OSError
+            logger.warning("Scrape cache unreadable (%s), treating as miss", e)
+
+        self._cache_misses += 1
+        logger.info("Scrape cache miss for %s (hits=%d, misses=%d)",
+                    key, self._cache_hits, self._cache_misses)
+        data = await self.scrape_google_maps(origin, destination)
+        if data:
+            try:
+                async with self._cache_lock:
+                    with shelve.open(CACHE_FILE) as cache:
+                        # Drop entries from older buckets so the file
+                        # doesn't grow without bound
+                        for stale_key in [k for k in cache.keys()
+                                          if not k.endswith(f":{bucket}")]:
+                            del cache[stale_key]
+                        cache[key] = data
+            except Exception as e:
+                logger.warning("Scrape cache write failed (%s), continuing uncached", e)
+        return data
+
+    async def _fetch_distance_matrix(self, origin: Endpoint, destination: Endpoint) -> Optional[Dict]:
+        """
+        Query the Google Distance Matrix API for live traffic data
+        Returns: Dictionary with duration, distance, and traffic status
+        """
+        try:
+            logger.info("Querying Distance Matrix API...")
+            async with httpx.AsyncClient(timeout=10) as client:
+                response = await client.get(
+                    DISTANCE_MATRIX_URL,
+                    params={
+                        'origins': origin.raw,
+                        'destinations': destination.raw,
+                        'mode': 'driving',
+                        'departure_time': 'now',
+                        'traffic_model': 'best_guess',
+                        'key': GOOGLE_MAPS_API_KEY,
+                    }
                 )
-                page = context.new_page()
-                
-                # Build Google Maps URL with two-wheeler mode
-                # For India, dirflg=b is for bicycle/two-wheeler mode
-                # dirflg=w for walking, dirflg=r for transit, dirflg=d for driving
-                from urllib.parse import quote
-                origin_encoded = quote(origin)
-                destination_encoded = quote(destination)
-                maps_url = f"https://www.google.com/maps/dir/{origin_encoded}/{destination_encoded}/?dirflg=b"
-                logger.info(f"Navigating to Google Maps (Two-wheeler mode): {maps_url}")
-                
-                page.goto(maps_url, wait_until="networkidle", timeout=30000)
-                
-                # Wait for the page to load and route to calculate
-                time.sleep(5)
-                
+            response.raise_for_status()
+            payload = response.json()
+
+            element = payload['rows'][0]['elements'][0]
+            if element.get('status') != 'OK':
+                logger.warning(f"Distance Matrix element status: {element.get('status')}")
+                return None
+
+            duration = element['duration']
+            duration_in_traffic = element.get('duration_in_traffic', duration)
+
+            # Classify traffic by how much the live estimate exceeds free-flow
+            ratio = duration_in_traffic['value'] / duration['value']
+            if ratio > 1.5:
+                traffic_status = "Heavy traffic"
+            elif ratio > 1.2:
+                traffic_status = "Moderate traffic"
+            else:
+                traffic_status = "Light traffic"
+
+            data = {
+                'duration_text': duration_in_traffic['text'],
+                'duration_minutes': round(duration_in_traffic['value'] / 60),
+                'distance': element['distance']['text'],
+                'traffic_status': traffic_status
+            }
+            logger.info("Successfully extracted: %s", data)
+            return data
+
+        except Exception as e:
+            logger.error(f"Error querying Distance Matrix API: {e}", exc_info=True)
+            return None
+
+    async def _fast_scrape(self, origin: Endpoint, destination: Endpoint) -> Optional[Dict]:
+        """
+        Probe the directions page over plain HTTP (no browser)
+        Google embeds the route data in the initial HTML it serves to
+        its own frontend, so a duration match here turns a ~10s browser
+        scrape into a ~300ms GET.
+        """
+        url = MAPS_URLS[(origin.name, destination.name)]
+        try:
+            logger.info("Probing directions page over HTTP...")
+            async with httpx.AsyncClient(timeout=5, follow_redirects=True) as client:
+                response = await client.get(
+                    url,
+                    headers={"User-Agent": USER_AGENT, "Accept-Language": "en-IN"}
+                )
+
+            match = _FAST_MIN_RE.search(response.text)
+            if not match:
+                logger.info("Fast path missed, no embedded duration found")
+                return None
+
+            duration_minutes = int(match.group(1))
+            km_match = _FAST_KM_RE.search(response.text)
+            data = {
+                'duration_text': f"{duration_minutes} min",
+                'duration_minutes': duration_minutes,
+                'distance': f"{km_match.group(1)} km" if km_match else "N/A",
+                'traffic_status': "Unknown"
+            }
+            logger.info("Successfully extracted: %s", data)
+            return data
+
+        except Exception as e:
+            logger.warning("Fast-path probe failed: %s", e)
+            return None
+
+    async def _scrape_with_playwright(self, origin: Endpoint, destination: Endpoint) -> Optional[Dict]:
+        """
+        Scrape Google Maps for traffic information (browser fallback)
+        Returns: Dictionary with duration, distance, and traffic status
+        """
+        try:
+            browser = await self._get_browser()
+            # One context per scrape keeps concurrent directions isolated
+            context = await browser.new_context(
+                viewport={'width': 1920, 'height': 1080},
+                user_agent=USER_AGENT
+            )
+            try:
+                await context.route("**/*", _block_unneeded_requests)
+                page = await context.new_page()
+
+                # Fail fast: a dead Maps call should give the slot back
+                # to the next cron tick instead of blocking for 30s
+                page.set_default_navigation_timeout(15000)
+                page.set_default_timeout(12000)
+
+                # Look up the precomputed two-wheeler directions URL
+                # (for India, dirflg=b is bicycle/two-wheeler mode;
+                # dirflg=w walking, dirflg=r transit, dirflg=d driving)
+                maps_url = MAPS_URLS[(origin.name, destination.name)]
+                if logger.isEnabledFor(logging.INFO):
+                    logger.info("Navigating to Google Maps (Two-wheeler mode): %s", maps_url)
+
+                # networkidle never fires reliably on Google Maps (long-poll
+                # telemetry), so wait for the route card itself instead
+                try:
+                    await page.goto(maps_url, wait_until="domcontentloaded", timeout=15000)
+                except PlaywrightTimeoutError:
+                    logger.warning("Navigation timeout, retrying once")
+                    await page.goto(maps_url, wait_until="commit", timeout=8000)
+                try:
+                    # Resume the instant the route card is in the DOM
+                    await page.wait_for_function(
+                        "sel => !!document.querySelector(sel)",
+                        arg=", ".join(DURATION_SELECTORS),
+                        timeout=8000
+                    )
+                except PlaywrightTimeoutError:
+                    logger.warning("Route card did not appear within 8s, extracting anyway")
+
                 # Try to extract travel information
-                data = self._extract_travel_data(page)
-                
-                browser.close()
-                
-                if data:
-                    logger.info(f"Successfully extracted: {data}")
-                    return data
-                else:
-                    logger.warning("Could not extract travel data")
-                    return None
-                    
+                data = await self._extract_travel_data(page)
+            finally:
+                await context.close()
+
+            if data:
+                logger.info("Successfully extracted: %s", data)
+                return data
+            else:
+                logger.warning("Could not extract travel data")
+                return None
+
         except Exception as e:
             logger.error(f"Error scraping Google Maps: {e}", exc_info=True)
             return None
     
-    def _extract_travel_data(self, page: Page) -> Optional[Dict]:
+    async def _extract_travel_data(self, page: Page) -> Optional[Dict]:
         """Extract travel time and distance from Google Maps page"""
         try:
-            # Wait a bit for the page to fully render
-            page.wait_for_timeout(3000)
-            
-            # Try multiple selectors for duration
-            duration_selectors = [
-                'div.Fk3sm.fontHeadlineSmall',  # Common selector for travel time
-                'div[jstcache="3"]',
-                'h1.TnqQD-ZMv3u-headline-4-text',
-                'div.XdKEzd',
-                'span.delay',
-            ]
-            
-            duration_text = None
-            for selector in duration_selectors:
-                try:
-                    elements = page.query_selector_all(selector)
-                    for element in elements:
-                        text = element.inner_text().strip()
-                        # Check if it looks like a duration (contains 'min' or 'hour')
-                        if 'min' in text.lower() or 'hour' in text.lower():
-                            duration_text = text
-                            break
-                    if duration_text:
-                        break
-                except:
-                    continue
-            
-            # Try to get distance
-            distance_selectors = [
-                'div.Fk3sm.fontBodyMedium',
-                'div.ivN21e.tUEI8e.fontBodyMedium',
-            ]
-            
-            distance_text = None
-            for selector in distance_selectors:
-                try:
-                    elements = page.query_selector_all(selector)
-                    for element in elements:
-                        text = element.inner_text().strip()
-                        # Check if it looks like a distance (contains 'km' or 'mi')
-                        if 'km' in text.lower() or 'mi' in text.lower():
-                            distance_text = text
-                            break
-                    if distance_text:
-                        break
-                except:
-                    continue
-            
-            # Look for traffic information in the page
-            traffic_status = "Unknown"
-            page_content = page.content()
-            if "traffic" in page_content.lower():
-                if "heavy traffic" in page_content.lower():
-                    traffic_status = "Heavy traffic"
-                elif "moderate traffic" in page_content.lower():
-                    traffic_status = "Moderate traffic"
-                elif "light traffic" in page_content.lower():
-                    traffic_status = "Light traffic"
-            
+            # Run all duration/distance selector queries in one evaluate
+            result = await page.evaluate(
+                _EXTRACT_JS,
+                [", ".join(DURATION_SELECTORS), ", ".join(DISTANCE_SELECTORS)]
+            )
+            duration_text = result['duration']
+            distance_text = result['distance']
+
+
+            # Traffic status is matched in-browser by the same evaluate,
+            # so there's no need to ship the whole DOM over CDP
+            traffic_status = result['traffic'].capitalize() if result['traffic'] else "Unknown"
+
+
             if duration_text:
                 duration_minutes = self.extract_duration_minutes(duration_text)
                 
@@ -215,18 +503,20 @@ class TrafficMonitor:
                         'traffic_status': traffic_status
                     }
             
-            # Fallback: try to get any visible text that might contain duration
+            # Fallback: let the browser find the first duration-looking
+            # node instead of shipping the whole body text over CDP and
+            # regexing it here
             logger.warning("Standard selectors failed, trying fallback method...")
-            body_text = page.inner_text('body')
-            
-            # Look for patterns like "25 min" or "1 h 30 min"
-            time_pattern = r'\b(\d+\s*h(?:our)?s?\s*)?(\d+\s*min)\b'
-            matches = re.findall(time_pattern, body_text, re.IGNORECASE)
-            
-            if matches:
-                duration_text = ' '.join(filter(None, matches[0])).strip()
+            try:
+                duration_text = await page.locator(
+                    r"text=/\b\d+\s*(?:min|h(?:our|r)?s?)\b/i"
+                ).first.inner_text(timeout=2000)
+            except PlaywrightTimeoutError:
+                duration_text = None
+
+            if duration_text:
                 duration_minutes = self.extract_duration_minutes(duration_text)
-                
+
                 if duration_minutes:
                     return {
                         'duration_text': duration_text,
@@ -238,77 +528,132 @@ class TrafficMonitor:
             return None
             
         except Exception as e:
-            logger.error(f"Error extracting travel data: {e}", exc_info=True)
+            logger.error("Error extracting travel data: %s", e)
             return None
     
-    def save_to_supabase(self, route_direction: str, data: Dict) -> bool:
-        """Save traffic data to Supabase"""
+    def save_to_supabase(self, route_direction: str, data: Dict, now: datetime) -> bool:
+        """
+        Queue traffic data for Supabase
+        Records are buffered and written in one batched insert, so each
+        save doesn't pay a full HTTP round-trip.
+        """
+        record = {
+            'timestamp': now.isoformat(timespec='seconds'),
+            'route_direction': route_direction,
+            'duration_minutes': data['duration_minutes'],
+            'duration_text': data['duration_text'],
+            'distance': data['distance'],
+            'traffic_status': data['traffic_status'],
+            'day_of_week': _DOW[now.weekday()]
+        }
+
+        self._pending.append(record)
+        logger.info("Queued record for Supabase (%d pending): %s", len(self._pending), record)
+
+        if (len(self._pending) >= BATCH_SIZE
+                or time.time() - self._last_flush > FLUSH_INTERVAL_SECONDS):
+            return self._flush()
+        return True
+
+    def _flush(self) -> bool:
+        """Write all pending records to Supabase in a single insert"""
+        if not self._pending:
+            return True
+
         try:
-            now = datetime.now(TIMEZONE)
-            
-            record = {
-                'timestamp': now.isoformat(),
-                'route_direction': route_direction,
-                'duration_minutes': data['duration_minutes'],
-                'duration_text': data['duration_text'],
-                'distance': data['distance'],
-                'traffic_status': data['traffic_status'],
-                'day_of_week': now.strftime('%A')
-            }
-            
-            result = self.supabase.table('traffic_data').insert(record).execute()
-            logger.info(f"Successfully saved to Supabase: {record}")
+            self.supabase.table('traffic_data').insert(self._pending).execute()
+            logger.info("Flushed %d record(s) to Supabase", len(self._pending))
+            self._pending.clear()
+            self._last_flush = time.time()
             return True
-            
+
         except Exception as e:
+            # Keep the buffer so a later flush can retry
             logger.error(f"Error saving to Supabase: {e}", exc_info=True)
             return False
     
+    async def _monitor_direction(self, route_direction: str, now: datetime):
+        """Scrape one direction and queue the result for Supabase"""
+        # Set origin and destination based on route direction
+        if route_direction == "home_to_office":
+            origin, destination = HOME, OFFICE
+            logger.info("Direction: Home → Office")
+        else:
+            origin, destination = OFFICE, HOME
+            logger.info("Direction: Office → Home")
+
+        # Scrape Google Maps (cached per direction and time bucket)
+        async with self._scrape_semaphore:
+            data = await self._cached_scrape(route_direction, origin, destination)
+
+        if data:
+            # Save to database
+            success = self.save_to_supabase(route_direction, data, now)
+            if success:
+                logger.info("✓ Traffic data collected and saved successfully")
+                print(f"✓ Success! Duration: {data['duration_text']}, Distance: {data['distance']}, Traffic: {data['traffic_status']}")
+            else:
+                logger.error("✗ Failed to save data to database")
+                print("✗ Failed to save data to database")
+        else:
+            logger.error("✗ Failed to collect traffic data")
+            print("✗ Failed to collect traffic data from Google Maps")
+
+    def _init_session(self):
+        """Create the loop-bound primitives for one asyncio session"""
+        self._scrape_semaphore = asyncio.Semaphore(2)
+        self._cache_lock = asyncio.Lock()
+
+    async def _run_async(self, route_direction: Optional[str]):
+        """Monitor a single direction, then release browser resources"""
+        now = datetime.now(TIMEZONE)
+
+        # Determine direction if not provided
+        if route_direction is None:
+            route_direction = self.determine_direction_from_time(now)
+
+        # Validate direction
+        if route_direction not in ['home_to_office', 'office_to_home']:
+            logger.error(f"Invalid route direction: {route_direction}")
+            return
+
+        logger.info(f"Starting traffic monitoring for route: {route_direction}")
+        try:
+            await self._monitor_direction(route_direction, now)
+        finally:
+            await self.aclose()
+
+    async def _run_both_async(self):
+        """Monitor both directions concurrently under one browser"""
+        now = datetime.now(TIMEZONE)
+        logger.info("Starting traffic monitoring for both routes")
+        try:
+            await asyncio.gather(
+                self._monitor_direction("home_to_office", now),
+                self._monitor_direction("office_to_home", now),
+            )
+        finally:
+            await self.aclose()
+
     def run(self, route_direction: Optional[str] = None):
         """
         Main execution method
         Args:
-            route_direction: 'home_to_office' or 'office_to_home'. 
+            route_direction: 'home_to_office' or 'office_to_home'.
                            If None, determines from current time.
         """
         try:
-            # Determine direction if not provided
-            if route_direction is None:
-                route_direction = self.determine_direction_from_time()
-            
-            # Validate direction
-            if route_direction not in ['home_to_office', 'office_to_home']:
-                logger.error(f"Invalid route direction: {route_direction}")
-                return
-            
-            logger.info(f"Starting traffic monitoring for route: {route_direction}")
-            
-            # Set origin and destination based on route direction
-            if route_direction == "home_to_office":
-                origin = HOME_ADDRESS
-                destination = OFFICE_ADDRESS
-                logger.info("Direction: Home → Office")
-            else:
-                origin = OFFICE_ADDRESS
-                destination = HOME_ADDRESS
-                logger.info("Direction: Office → Home")
-            
-            # Scrape Google Maps
-            data = self.scrape_google_maps(origin, destination)
-            
-            if data:
-                # Save to database
-                success = self.save_to_supabase(route_direction, data)
-                if success:
-                    logger.info("✓ Traffic data collected and saved successfully")
-                    print(f"✓ Success! Duration: {data['duration_text']}, Distance: {data['distance']}, Traffic: {data['traffic_status']}")
-                else:
-                    logger.error("✗ Failed to save data to database")
-                    print("✗ Failed to save data to database")
-            else:
-                logger.error("✗ Failed to collect traffic data")
-                print("✗ Failed to collect traffic data from Google Maps")
-                
+            self._init_session()
+            asyncio.run(self._run_async(route_direction))
+        except Exception as e:
+            logger.error(f"Error in main execution: {e}", exc_info=True)
+            print(f"✗ Error: {e}")
+
+    def run_both(self):
+        """Collect both route directions in one run, sharing the browser"""
+        try:
+            self._init_session()
+            asyncio.run(self._run_both_async())
         except Exception as e:
             logger.error(f"Error in main execution: {e}", exc_info=True)
             print(f"✗ Error: {e}")
@@ -321,20 +666,22 @@ def main():
     parser = argparse.ArgumentParser(description='Monitor traffic between home and office')
     parser.add_argument(
         '--direction',
-        choices=['home_to_office', 'office_to_home', 'auto'],
+        choices=['home_to_office', 'office_to_home', 'both', 'auto'],
         default='auto',
         help='Route direction (default: auto - determines from current time)'
     )
-    
+
     args = parser.parse_args()
-    
+
     try:
         monitor = TrafficMonitor()
-        
-        # Determine direction
-        direction = None if args.direction == 'auto' else args.direction
-        
-        monitor.run(direction)
+
+        if args.direction == 'both':
+            monitor.run_both()
+        else:
+            # Determine direction
+            direction = None if args.direction == 'auto' else args.direction
+            monitor.run(direction)
     except Exception as e:
         logger.error(f"Fatal error: {e}", exc_info=True)
         print(f"✗ Fatal error: {e}")